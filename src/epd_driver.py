@@ -1,12 +1,16 @@
 """Minimal wrapper for Waveshare e-Paper drivers.
 
 This file keeps the import contained so we can print a clear message when
-the Waveshare Python library is not installed on the Pi.
+the Waveshare Python library is not installed on the Pi. It also provides
+``FastEPD``, a bulk SPI transfer path over the stock driver.
 """
 
 from __future__ import annotations
 
-from typing import Any, Iterable
+from dataclasses import dataclass
+import sys
+import time
+from typing import Any, Iterable, Optional
 
 
 def load_epd_driver(model: str) -> Any:
@@ -31,3 +35,133 @@ def _load_epd_driver_candidates(models: Iterable[str]) -> Any:
             "Install it from the Waveshare e-Paper repo before running."
         ) from last_exc
     raise RuntimeError("No Waveshare e-Paper driver could be loaded.")
+
+
+@dataclass(frozen=True)
+class TransferStats:
+    num_bytes: int
+    seconds: float
+
+    @property
+    def bytes_per_sec(self) -> float:
+        return self.num_bytes / self.seconds if self.seconds > 0 else 0.0
+
+    def __str__(self) -> str:
+        return (
+            f"{self.num_bytes} bytes in {self.seconds * 1000:.1f} ms "
+            f"({self.bytes_per_sec / 1024:.0f} KiB/s)"
+        )
+
+
+class FastEPD:
+    """Wraps a Waveshare ``EPD`` with a bulk SPI framebuffer transfer path.
+
+    Some stock drivers push frames through ``send_data`` one byte at a time
+    and build buffers pixel by pixel in Python. This wrapper packs images with
+    ``Image.tobytes`` and streams RAM writes in large ``writebytes2`` chunks,
+    recording the cost of every transfer in ``last_transfer``. Everything
+    else is delegated to the wrapped driver.
+    """
+
+    _WRITE_BW_RAM = 0x24
+    _CHUNK_SIZE = 4096
+
+    def __init__(self, epd: Any, spi: Any = None, config: Any = None) -> None:
+        self._epd = epd
+        self._config = config or sys.modules[type(epd).__module__].epdconfig
+        self._spi = spi or self._config.SPI
+        self._line_bytes = (epd.width + 7) // 8
+        self.last_transfer: Optional[TransferStats] = None
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._epd, name)
+
+    def getbuffer(self, image: Any) -> bytes:
+        if image.size == (self._epd.height, self._epd.width):
+            image = image.rotate(90, expand=True)
+        if image.size != (self._epd.width, self._epd.height):
+            raise ValueError(
+                f"Image size {image.size} does not match panel "
+                f"{self._epd.width}x{self._epd.height}."
+            )
+        # Mode "1" rows are packed MSB-first and padded to whole bytes, which
+        # is the panel's RAM layout.
+        return image.convert("1").tobytes()
+
+    def write_frame(self, buffer: bytes) -> TransferStats:
+        self._epd.send_command(self._WRITE_BW_RAM)
+        return self._stream(buffer)
+
+    def write_window(
+        self, buffer: bytes, x0: int, y0: int, x1: int, y1: int
+    ) -> TransferStats:
+        """Write the packed-buffer rows ``y0..y1`` between columns ``x0..x1``.
+
+        ``x0`` must be byte aligned. ``buffer`` is a full-frame buffer from
+        ``getbuffer``; only the window is sent.
+        """
+        if not self._has_windows():
+            raise RuntimeError("This EPD driver does not support RAM windows.")
+        if not (0 <= x0 <= x1 < self._epd.width and 0 <= y0 <= y1 < self._epd.height):
+            raise ValueError(
+                f"Window ({x0}, {y0})-({x1}, {y1}) is outside the "
+                f"{self._epd.width}x{self._epd.height} panel."
+            )
+        if x0 % 8:
+            raise ValueError("Window x0 must be a multiple of 8.")
+        first = x0 // 8
+        last = x1 // 8
+        view = memoryview(buffer)
+        window = b"".join(
+            view[row * self._line_bytes + first : row * self._line_bytes + last + 1]
+            for row in range(y0, y1 + 1)
+        )
+        self._epd.SetWindow(x0, y0, x1, y1)
+        # SetWindow shifts x into byte columns itself; SetCursor does not.
+        self._epd.SetCursor(first, y0)
+        self.last_transfer = self.write_frame(window)
+        return self.last_transfer
+
+    def display(self, buffer: bytes) -> None:
+        if self._has_windows():
+            # Undo any window left behind by write_window so the full frame
+            # does not wrap inside it.
+            self._epd.SetWindow(0, 0, self._epd.width - 1, self._epd.height - 1)
+            self._epd.SetCursor(0, 0)
+        self.last_transfer = self.write_frame(buffer)
+        self._epd.TurnOnDisplay()
+
+    def Clear(self, color: int = 0xFF) -> None:
+        self.display(bytes([color]) * (self._line_bytes * self._epd.height))
+
+    def _has_windows(self) -> bool:
+        return hasattr(self._epd, "SetWindow") and hasattr(self._epd, "SetCursor")
+
+    def _stream(self, buffer: bytes) -> TransferStats:
+        view = memoryview(buffer)
+        writebytes2 = getattr(self._spi, "writebytes2", None)
+        start = time.perf_counter()
+        self._config.digital_write(self._epd.dc_pin, 1)
+        self._config.digital_write(self._epd.cs_pin, 0)
+        try:
+            for offset in range(0, len(view), self._CHUNK_SIZE):
+                chunk = view[offset : offset + self._CHUNK_SIZE]
+                if writebytes2 is not None:
+                    writebytes2(chunk)
+                else:
+                    self._spi.writebytes(list(chunk))
+        finally:
+            self._config.digital_write(self._epd.cs_pin, 1)
+        return TransferStats(len(view), time.perf_counter() - start)
+
+
+def wrap_fast_transfer(epd: Any) -> Any:
+    """Return ``epd`` wrapped in ``FastEPD``, or as-is if it lacks spidev."""
+    module = sys.modules.get(type(epd).__module__)
+    config = getattr(module, "epdconfig", None)
+    if config is None or getattr(config, "SPI", None) is None:
+        return epd
+    required = ("send_command", "TurnOnDisplay", "dc_pin", "cs_pin")
+    if not all(hasattr(epd, name) for name in required):
+        return epd
+    return FastEPD(epd, config=config)
@@ -9,7 +9,7 @@ import os
 import queue
 import threading
 import time
-from typing import Iterable, Optional, Tuple
+from typing import Dict, Iterable, List, Optional, Tuple
 
 from PIL import Image, ImageDraw, ImageFont, ImageOps
 
@@ -26,7 +26,11 @@ from config import (
     TOUCH_Y_MAX,
     TOUCH_Y_MIN,
 )
-from epd_driver import _load_epd_driver_candidates
+from epd_driver import _load_epd_driver_candidates, wrap_fast_transfer
+from tracing import TraceRecorder, TraceReplayer
+
+
+LAYOUT_MARGIN = 4
 
 
 @dataclass(frozen=True)
@@ -35,6 +39,14 @@ class Component:
     box: Tuple[int, int, int, int]
 
 
+@dataclass
+class LoopStats:
+    iterations: int = 0
+    actions: int = 0
+    renders: int = 0
+    max_iteration_sec: float = 0.0
+
+
 def _load_font(size: int) -> ImageFont.FreeTypeFont | ImageFont.ImageFont:
     try:
         return ImageFont.truetype(
@@ -63,12 +75,42 @@ def _landscape_image(epd) -> Tuple[Image.Image, int, int, bool]:
     return Image.new("1", (epd.height, epd.width), 255), epd.height, epd.width, True
 
 
+def _album_art_size(epd) -> int:
+    return min(epd.width, epd.height) - 2 * LAYOUT_MARGIN
+
+
 def _fit_album_art(art: Image.Image, size: int) -> Image.Image:
+    if art.mode == "1" and art.size == (size, size):
+        return art
     art = art.convert("L")
     art = ImageOps.fit(art, (size, size), method=Image.LANCZOS)
     return art.convert("1")
 
 
+def _decode_album_art(data: bytes, size: int) -> Optional[Image.Image]:
+    """Decode cover art straight to the final 1-bit bitmap.
+
+    ``draft`` lets the JPEG decoder scale by 1/2, 1/4 or 1/8 in the DCT
+    domain, so the full-resolution cover is never materialised.
+    """
+    try:
+        with Image.open(BytesIO(data)) as src:
+            source_size = src.size
+            src.draft("L", (size, size))
+            decoded_size = src.size
+            art = _fit_album_art(src, size)
+            if art is src:
+                art = src.copy()
+    except OSError:
+        return None
+    print(
+        f"Album art: {source_size[0]}x{source_size[1]} decoded at "
+        f"{decoded_size[0]}x{decoded_size[1]}, kept {art.width}x{art.height} "
+        f"({len(art.tobytes())} bytes)"
+    )
+    return art
+
+
 def _render_layout(
     epd,
     title: str,
@@ -79,8 +121,8 @@ def _render_layout(
     image, width, height, needs_rotate = _landscape_image(epd)
     draw = ImageDraw.Draw(image)
 
-    margin = 4
-    image_size = height - 2 * margin
+    margin = LAYOUT_MARGIN
+    image_size = _album_art_size(epd)
     left_x0 = margin
     left_y0 = margin
     left_x1 = left_x0 + image_size
@@ -220,6 +262,13 @@ def _render_layout(
     return image, components, needs_rotate
 
 
+def _show(epd, image: Image.Image) -> None:
+    epd.display(epd.getbuffer(image))
+    transfer = getattr(epd, "last_transfer", None)
+    if transfer is not None:
+        print(f"Frame transfer: {transfer}")
+
+
 def _find_touch_device() -> Optional[str]:
     import glob
     env_path = os.environ.get("TOUCH_DEVICE")
@@ -242,12 +291,101 @@ def _map_axis(value: int, min_value: Optional[int], max_value: Optional[int], si
     return int((value - min_value) * (size - 1) / (max_value - min_value))
 
 
+# Linux input event codes (linux/input-event-codes.h), so recorded evdev
+# traces can be decoded without python-evdev installed.
+_EV_SYN = 0x00
+_EV_KEY = 0x01
+_EV_ABS = 0x03
+_SYN_REPORT = 0x00
+_BTN_TOUCH = 0x14A
+_ABS_X = 0x00
+_ABS_Y = 0x01
+_ABS_MT_POSITION_X = 0x35
+_ABS_MT_POSITION_Y = 0x36
+_ABS_MT_TRACKING_ID = 0x39
+
+
+def _hit_component(
+    components: Iterable[Component], touch_x: int, touch_y: int
+) -> Optional[str]:
+    for component in components:
+        x0, y0, x1, y1 = component.box
+        if x0 <= touch_x <= x1 and y0 <= touch_y <= y1:
+            return component.name
+    return None
+
+
+class _EvdevTouchDecoder:
+    """Turns raw evdev (type, code, value) events into landscape touches.
+
+    ``absinfo`` maps "x", "y", "mx" and "my" to the axis ``[min, max]`` range,
+    or None when the device does not report that axis.
+    """
+
+    def __init__(
+        self,
+        absinfo: Dict[str, Optional[List[int]]],
+        width: int,
+        height: int,
+        needs_rotate: bool,
+    ) -> None:
+        self._abs_x = absinfo.get("x")
+        self._abs_y = absinfo.get("y")
+        self._abs_mx = absinfo.get("mx")
+        self._abs_my = absinfo.get("my")
+        self._width = width
+        self._height = height
+        self._needs_rotate = needs_rotate
+        self._x = 0
+        self._y = 0
+        self._touching = False
+
+    def feed(self, ev_type: int, code: int, value: int) -> Optional[Tuple[int, int]]:
+        if ev_type == _EV_ABS:
+            if code == _ABS_MT_POSITION_X and self._abs_mx:
+                self._x = _map_axis(value, *self._abs_mx, self._width)
+            elif code == _ABS_MT_POSITION_Y and self._abs_my:
+                self._y = _map_axis(value, *self._abs_my, self._height)
+            elif code == _ABS_X and self._abs_x:
+                self._x = _map_axis(value, *self._abs_x, self._width)
+            elif code == _ABS_Y and self._abs_y:
+                self._y = _map_axis(value, *self._abs_y, self._height)
+            elif code == _ABS_MT_TRACKING_ID:
+                self._touching = value >= 0
+        elif ev_type == _EV_KEY and code == _BTN_TOUCH:
+            self._touching = value == 1
+        elif ev_type == _EV_SYN and code == _SYN_REPORT:
+            if not self._touching:
+                return None
+            touch_x, touch_y = self._x, self._y
+            if (
+                self._needs_rotate
+                and (self._abs_x or self._abs_mx)
+                and (self._abs_y or self._abs_my)
+            ):
+                # Rotate raw portrait touch coords into landscape coordinates.
+                touch_x, touch_y = self._y, (self._width - 1 - self._x)
+            return touch_x, touch_y
+        return None
+
+
+def _gt1151_touch(
+    x: int, y: int, width: int, height: int, needs_rotate: bool
+) -> Tuple[int, int]:
+    touch_x = _map_axis(x, TOUCH_X_MIN, TOUCH_X_MAX, width)
+    touch_y = _map_axis(y, TOUCH_Y_MIN, TOUCH_Y_MAX, height)
+    if needs_rotate:
+        touch_x, touch_y = touch_y, (width - 1 - touch_x)
+    return touch_x, touch_y
+
+
 def _touch_loop_evdev(
     components: Iterable[Component],
     width: int,
     height: int,
     needs_rotate: bool,
     event_queue: "queue.Queue[str]",
+    recorder: Optional[TraceRecorder] = None,
 ) -> None:
     try:
         from evdev import InputDevice, ecodes
@@ -262,47 +400,32 @@ def _touch_loop_evdev(
 
     dev = InputDevice(device_path)
     abs_caps = dev.capabilities().get(ecodes.EV_ABS)
-    abs_x = dev.absinfo(ecodes.ABS_X) if abs_caps else None
-    abs_y = dev.absinfo(ecodes.ABS_Y) if abs_caps else None
-    abs_mx = dev.absinfo(ecodes.ABS_MT_POSITION_X) if abs_caps else None
-    abs_my = dev.absinfo(ecodes.ABS_MT_POSITION_Y) if abs_caps else None
-
-    x = 0
-    y = 0
-    touching = False
+    absinfo: Dict[str, Optional[List[int]]] = {}
+    for name, code in (
+        ("x", ecodes.ABS_X),
+        ("y", ecodes.ABS_Y),
+        ("mx", ecodes.ABS_MT_POSITION_X),
+        ("my", ecodes.ABS_MT_POSITION_Y),
+    ):
+        info = dev.absinfo(code) if abs_caps else None
+        absinfo[name] = [info.min, info.max] if info else None
+    if recorder is not None:
+        recorder.record("evdev_info", abs=absinfo)
+
+    decoder = _EvdevTouchDecoder(absinfo, width, height, needs_rotate)
     debug_raw = os.environ.get("DEBUG_TOUCH") == "1"
     print(f"Listening for touches on {device_path} ...")
     for event in dev.read_loop():
         if debug_raw:
             print(event)
-        if event.type == ecodes.EV_ABS:
-            if event.code == ecodes.ABS_MT_POSITION_X and abs_mx:
-                x = _map_axis(event.value, abs_mx.min, abs_mx.max, width)
-            elif event.code == ecodes.ABS_MT_POSITION_Y and abs_my:
-                y = _map_axis(event.value, abs_my.min, abs_my.max, height)
-            elif event.code == ecodes.ABS_X and abs_x:
-                x = _map_axis(event.value, abs_x.min, abs_x.max, width)
-            elif event.code == ecodes.ABS_Y and abs_y:
-                y = _map_axis(event.value, abs_y.min, abs_y.max, height)
-            elif event.code == ecodes.ABS_MT_TRACKING_ID:
-                touching = event.value >= 0
-        elif event.type == ecodes.EV_KEY and event.code == ecodes.BTN_TOUCH:
-            touching = event.value == 1
-        elif event.type == ecodes.EV_SYN and event.code == ecodes.SYN_REPORT:
-            if not touching:
-                continue
-            touch_x, touch_y = x, y
-            if needs_rotate and (abs_x or abs_mx) and (abs_y or abs_my):
-                # Rotate raw portrait touch coords into landscape coordinates.
-                touch_x, touch_y = y, (width - 1 - x)
-            for component in components:
-                x0, y0, x1, y1 = component.box
-                if x0 <= touch_x <= x1 and y0 <= touch_y <= y1:
-                    event_queue.put(component.name)
-                    break
-            else:
-                pass
-
+        if recorder is not None:
+            recorder.record("evdev", e=[event.type, event.code, event.value])
+        touch = decoder.feed(event.type, event.code, event.value)
+        if touch is None:
+            continue
+        name = _hit_component(components, *touch)
+        if name:
+            event_queue.put(name)
 
 
 def _touch_loop_gt1151(
@@ -311,6 +434,7 @@ def _touch_loop_gt1151(
     height: int,
     needs_rotate: bool,
     event_queue: "queue.Queue[str]",
+    recorder: Optional[TraceRecorder] = None,
 ) -> None:
     try:
         from touch_gt1151 import GT1151
@@ -338,49 +462,187 @@ def _touch_loop_gt1151(
             points = gt.read_points()
             if not points:
                 continue
-            touch_x = _map_axis(points[0].x, TOUCH_X_MIN, TOUCH_X_MAX, width)
-            touch_y = _map_axis(points[0].y, TOUCH_Y_MIN, TOUCH_Y_MAX, height)
-            if needs_rotate:
-                touch_x, touch_y = touch_y, (width - 1 - touch_x)
-            for component in components:
-                x0, y0, x1, y1 = component.box
-                if x0 <= touch_x <= x1 and y0 <= touch_y <= y1:
-                    event_queue.put(component.name)
-                    break
-            else:
-                pass
+            if recorder is not None:
+                recorder.record(
+                    "gt1151",
+                    p=[[pt.x, pt.y, pt.size, pt.track_id] for pt in points],
+                )
+            touch = _gt1151_touch(points[0].x, points[0].y, width, height, needs_rotate)
+            name = _hit_component(components, *touch)
+            if name:
+                event_queue.put(name)
     except KeyboardInterrupt:
         pass
     finally:
         gt.close()
 
 
+def _touch_loop_replay(
+    components: Iterable[Component],
+    width: int,
+    height: int,
+    needs_rotate: bool,
+    event_queue: "queue.Queue[str]",
+    replayer: TraceReplayer,
+) -> None:
+    decoder = _EvdevTouchDecoder(replayer.evdev_absinfo(), width, height, needs_rotate)
+    for record in replayer.touch_records():
+        if record["k"] == "evdev":
+            touch = decoder.feed(*record["e"])
+        else:
+            x, y = record["p"][0][:2]
+            touch = _gt1151_touch(x, y, width, height, needs_rotate)
+        if touch is None:
+            continue
+        name = _hit_component(components, *touch)
+        if name:
+            event_queue.put(name)
+
+
 def _run_touch_loop(
     components: Iterable[Component],
     width: int,
     height: int,
     needs_rotate: bool,
     event_queue: "queue.Queue[str]",
+    recorder: Optional[TraceRecorder] = None,
+    replayer: Optional[TraceReplayer] = None,
 ) -> None:
-    if TOUCH_BACKEND.lower() == "gt1151":
-        _touch_loop_gt1151(components, width, height, needs_rotate, event_queue)
+    if replayer is not None:
+        _touch_loop_replay(components, width, height, needs_rotate, event_queue, replayer)
+    elif TOUCH_BACKEND.lower() == "gt1151":
+        _touch_loop_gt1151(
+            components, width, height, needs_rotate, event_queue, recorder
+        )
     else:
-        _touch_loop_evdev(components, width, height, needs_rotate, event_queue)
+        _touch_loop_evdev(components, width, height, needs_rotate, event_queue, recorder)
 
 
 def _start_touch_loop(
-    components: Iterable[Component], width: int, height: int, needs_rotate: bool
+    components: Iterable[Component],
+    width: int,
+    height: int,
+    needs_rotate: bool,
+    recorder: Optional[TraceRecorder] = None,
+    replayer: Optional[TraceReplayer] = None,
 ) -> "queue.Queue[str]":
     event_queue: "queue.Queue[str]" = queue.Queue()
     thread = threading.Thread(
         target=_run_touch_loop,
-        args=(components, width, height, needs_rotate, event_queue),
+        args=(components, width, height, needs_rotate, event_queue, recorder, replayer),
         daemon=True,
     )
     thread.start()
     return event_queue
 
 
+def _run_app(
+    epd,
+    spotify,
+    poll_sec: float,
+    debounce_sec: float,
+    recorder: Optional[TraceRecorder] = None,
+    replayer: Optional[TraceReplayer] = None,
+    stop: Optional[threading.Event] = None,
+) -> LoopStats:
+    from spotify_client import SpotifyUnavailable
+
+    title = "Waiting for Spotify..."
+    artist = "Open Spotify on a device"
+    image, components, needs_rotate = _render_layout(
+        epd, title, artist, art=None, is_playing=False
+    )
+    if needs_rotate:
+        image = image.rotate(90, expand=True)
+    _show(epd, image)
+
+    event_queue = _start_touch_loop(
+        components, image.width, image.height, needs_rotate, recorder, replayer
+    )
+    stats = LoopStats()
+    last_action: dict[str, float] = {}
+    last_render_key: Optional[Tuple[str, bool, str, str]] = None
+    current_track_id: Optional[str] = None
+    current_art: Optional[Image.Image] = None
+    art_size = _album_art_size(epd)
+    next_poll = 0.0
+
+    while stop is None or not stop.is_set():
+        now = time.monotonic()
+        while True:
+            try:
+                action = event_queue.get_nowait()
+            except queue.Empty:
+                break
+            last_time = last_action.get(action, 0.0)
+            if now - last_time < debounce_sec:
+                continue
+            last_action[action] = now
+            stats.actions += 1
+            try:
+                if action == "Play/Pause":
+                    spotify.toggle_play_pause()
+                elif action == "Next":
+                    spotify.next_track()
+                elif action == "Like":
+                    spotify.like_current()
+            except Exception as exc:
+                print(f"Spotify {action} failed: {exc}")
+            last_render_key = None
+
+        if now >= next_poll:
+            next_poll = now + poll_sec
+            offline = False
+            try:
+                track = spotify.current_track(art_size)
+            except SpotifyUnavailable as exc:
+                print(f"Spotify offline: {exc}")
+                track = spotify.last_known_track()
+                offline = True
+            except Exception as exc:
+                print(f"Spotify poll failed: {exc}")
+                track = spotify.last_known_track()
+                offline = True
+            if track:
+                if track.track_id != current_track_id:
+                    art_bytes = spotify.get_album_art(track.track_id, track.art_url)
+                    current_art = (
+                        _decode_album_art(art_bytes, art_size) if art_bytes else None
+                    )
+                    current_track_id = track.track_id
+                title = track.title or "Unknown title"
+                artist = track.artist or "Unknown artist"
+                if offline:
+                    artist = f"Offline - {artist}"
+                render_key = (track.track_id, track.is_playing, title, artist)
+                is_playing = track.is_playing
+            else:
+                current_track_id = None
+                current_art = None
+                title = "No active device"
+                artist = "Open Spotify on a device"
+                if offline:
+                    title = "Offline"
+                    artist = "Waiting for network..."
+                render_key = ("none", False, title, artist)
+                is_playing = False
+
+            if render_key != last_render_key:
+                image, _, _ = _render_layout(
+                    epd, title, artist, current_art, is_playing
+                )
+                if needs_rotate:
+                    image = image.rotate(90, expand=True)
+                _show(epd, image)
+                last_render_key = render_key
+                stats.renders += 1
+
+        stats.iterations += 1
+        stats.max_iteration_sec = max(stats.max_iteration_sec, time.monotonic() - now)
+        sleep(0.05)
+    return stats
+
+
 def main() -> None:
     try:
         from spotify_client import SpotifyController
@@ -388,7 +650,7 @@ def main() -> None:
         print(f"Spotify disabled: {exc}")
         return
 
-    epd = _load_epd_driver_candidates(EPD_MODEL_CANDIDATES)
+    epd = wrap_fast_transfer(_load_epd_driver_candidates(EPD_MODEL_CANDIDATES))
     try:
         epd.init()
     except TypeError:
@@ -401,96 +663,37 @@ def main() -> None:
             raise
     epd.Clear(0xFF)
 
+    recorder: Optional[TraceRecorder] = None
+    trace_path = os.environ.get("TRACE_RECORD")
+    if trace_path:
+        recorder = TraceRecorder(trace_path)
+        print(f"Recording trace to {trace_path}")
+
     try:
-        spotify = SpotifyController()
+        spotify = SpotifyController(recorder=recorder)
     except Exception as exc:
         print(f"Spotify disabled: {exc}")
+        if recorder is not None:
+            recorder.close()
         return
 
-    title = "Waiting for Spotify..."
-    artist = "Open Spotify on a device"
-    image, components, needs_rotate = _render_layout(
-        epd, title, artist, art=None, is_playing=False
-    )
-    if needs_rotate:
-        image = image.rotate(90, expand=True)
-    epd.display(epd.getbuffer(image))
     try:
-        event_queue = _start_touch_loop(components, image.width, image.height, needs_rotate)
-        poll_sec = float(os.environ.get("SPOTIFY_POLL_SEC", "5"))
-        debounce_sec = float(os.environ.get("TOUCH_DEBOUNCE_SEC", "0.35"))
-        last_action: dict[str, float] = {}
-        last_render_key: Optional[Tuple[str, bool, str, str]] = None
-        current_track_id: Optional[str] = None
-        current_art: Optional[Image.Image] = None
-        next_poll = 0.0
-
-        while True:
-            now = time.monotonic()
-            while True:
-                try:
-                    action = event_queue.get_nowait()
-                except queue.Empty:
-                    break
-                last_time = last_action.get(action, 0.0)
-                if now - last_time < debounce_sec:
-                    continue
-                last_action[action] = now
-                if action == "Play/Pause":
-                    spotify.toggle_play_pause()
-                elif action == "Next":
-                    spotify.next_track()
-                elif action == "Like":
-                    spotify.like_current()
-                last_render_key = None
-
-            if now >= next_poll:
-                next_poll = now + poll_sec
-                track = spotify.current_track()
-                if track:
-                    if track.track_id != current_track_id:
-                        art_bytes = spotify.get_album_art(track.track_id, track.art_url)
-                        if art_bytes:
-                            try:
-                                current_art = Image.open(BytesIO(art_bytes))
-                            except OSError:
-                                current_art = None
-                        else:
-                            current_art = None
-                        current_track_id = track.track_id
-                    title = track.title or "Unknown title"
-                    artist = track.artist or "Unknown artist"
-                    render_key = (track.track_id, track.is_playing, title, artist)
-                    is_playing = track.is_playing
-                else:
-                    current_track_id = None
-                    current_art = None
-                    title = "No active device"
-                    artist = "Open Spotify on a device"
-                    render_key = ("none", False, title, artist)
-                    is_playing = False
-
-                if render_key != last_render_key:
-                    image, _, _ = _render_layout(
-                        epd, title, artist, current_art, is_playing
-                    )
-                    if needs_rotate:
-                        image = image.rotate(90, expand=True)
-                    epd.display(epd.getbuffer(image))
-                    last_render_key = render_key
-
-            sleep(0.05)
+        _run_app(
+            epd,
+            spotify,
+            poll_sec=float(os.environ.get("SPOTIFY_POLL_SEC", "5")),
+            debounce_sec=float(os.environ.get("TOUCH_DEBOUNCE_SEC", "0.35")),
+            recorder=recorder,
+        )
     except KeyboardInterrupt:
         pass
     finally:
         sleep(1)
         epd.sleep()
+        spotify.close()
+        if recorder is not None:
+            recorder.close()
 
 
 if __name__ == "__main__":
     main()
-
-
-
-
-
@@ -0,0 +1,103 @@
+"""Replay a recorded trace through the touch pipeline and Spotify controller.
+
+Runs the main loop against a null display, with touches and API responses
+fed from a trace recorded via ``TRACE_RECORD``. No hardware or network is
+needed.
+
+Usage:
+    python3 src/replay.py trace.jsonl.gz [--speed 10]
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+import tempfile
+import threading
+
+from main import _run_app
+from tracing import TraceReplayer, load_trace
+
+
+class NullEPD:
+    """Display stand-in with the 2.13" panel geometry that discards frames."""
+
+    width = 122
+    height = 250
+
+    def __init__(self) -> None:
+        self.frames = 0
+
+    def getbuffer(self, image) -> bytes:
+        return image.tobytes()
+
+    def display(self, buffer: bytes) -> None:
+        self.frames += 1
+
+    def sleep(self) -> None:
+        pass
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("trace", help="Trace file recorded with TRACE_RECORD.")
+    parser.add_argument(
+        "--speed", type=float, default=1.0, help="Replay speed multiplier."
+    )
+    args = parser.parse_args()
+
+    replayer = TraceReplayer(load_trace(args.trace), speed=args.speed)
+    # Scale every time-based setting with the replay so timeouts and breaker
+    # cooldowns skip the same polls as they did in the recording.
+    speed = args.speed
+    recorded_poll_sec = float(os.environ.get("SPOTIFY_POLL_SEC", "5"))
+    poll_sec = recorded_poll_sec / speed
+    debounce_sec = float(os.environ.get("TOUCH_DEBOUNCE_SEC", "0.35")) / speed
+    timeout = float(os.environ.get("SPOTIFY_TIMEOUT_SEC", "3")) / speed
+    backoff_base = (
+        float(os.environ.get("SPOTIFY_BACKOFF_BASE_SEC", 2 * recorded_poll_sec)) / speed
+    )
+    backoff_max = float(os.environ.get("SPOTIFY_BACKOFF_MAX_SEC", "60")) / speed
+
+    from spotify_client import SpotifyController
+
+    # Keep replay state out of the real art cache.
+    art_cache = tempfile.TemporaryDirectory(prefix="replay-art-")
+    client = replayer.spotify_client()
+    spotify = SpotifyController(
+        client=client,
+        download_art=False,
+        timeout=timeout,
+        backoff_base=backoff_base,
+        backoff_max=backoff_max,
+        art_cache_dir=art_cache.name,
+    )
+    epd = NullEPD()
+    stop = threading.Event()
+    timer = threading.Timer(replayer.duration + poll_sec, stop.set)
+    timer.daemon = True
+    timer.start()
+    try:
+        stats = _run_app(
+            epd,
+            spotify,
+            poll_sec=poll_sec,
+            debounce_sec=debounce_sec,
+            replayer=replayer,
+            stop=stop,
+        )
+    except KeyboardInterrupt:
+        return
+    finally:
+        spotify.close()
+        art_cache.cleanup()
+    print(
+        f"Replayed {args.trace} at {args.speed:g}x: "
+        f"{stats.iterations} loop iterations, {stats.actions} actions, "
+        f"{stats.renders} renders, max iteration {stats.max_iteration_sec * 1000:.1f} ms, "
+        f"{client.pending} API responses unused"
+    )
+
+
+if __name__ == "__main__":
+    main()
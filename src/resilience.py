@@ -0,0 +1,135 @@
+"""Bounded-latency wrappers for network calls.
+
+The main loop runs on a single thread, so a call that blocks on a dead
+Wi-Fi link stalls touch handling and redraws with it. Every call made
+through ``ResilientCaller`` gets a hard deadline, and a circuit breaker stops
+issuing calls while the remote side keeps failing.
+"""
+
+from __future__ import annotations
+
+from concurrent.futures import Future, TimeoutError as FutureTimeout
+import random
+import threading
+import time
+from typing import Callable, Optional, TypeVar
+
+T = TypeVar("T")
+
+
+class DeadlineExceeded(TimeoutError):
+    """Raised when a call does not finish within its deadline."""
+
+
+class CircuitOpenError(RuntimeError):
+    """Raised instead of calling out while the circuit breaker is open."""
+
+
+class CircuitBreaker:
+    """Consecutive-failure breaker with exponential backoff and jitter.
+
+    After ``failure_threshold`` failures in a row the breaker opens and
+    rejects calls until a cooldown passes. The cooldown doubles on every
+    reopen (capped at ``max_delay``) and half of it is randomised so several
+    clients do not retry in lockstep. Once it expires a single trial call is
+    let through; success closes the breaker, failure reopens it.
+    """
+
+    def __init__(
+        self,
+        failure_threshold: int = 3,
+        base_delay: float = 1.0,
+        max_delay: float = 60.0,
+        clock: Callable[[], float] = time.monotonic,
+        rng: Callable[[], float] = random.random,
+    ) -> None:
+        self._failure_threshold = max(1, failure_threshold)
+        self._base_delay = base_delay
+        self._max_delay = max_delay
+        self._clock = clock
+        self._rng = rng
+        self._lock = threading.Lock()
+        self._failures = 0
+        self._opens = 0
+        self._retry_at: Optional[float] = None
+        self._trial_in_flight = False
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self._retry_at is None:
+                return True
+            if self._clock() < self._retry_at or self._trial_in_flight:
+                return False
+            self._trial_in_flight = True
+            return True
+
+    def record_success(self) -> None:
+        with self._lock:
+            self._failures = 0
+            self._opens = 0
+            self._retry_at = None
+            self._trial_in_flight = False
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self._failures += 1
+            self._trial_in_flight = False
+            if self._retry_at is None and self._failures < self._failure_threshold:
+                return
+            self._opens += 1
+            delay = min(self._max_delay, self._base_delay * (2 ** (self._opens - 1)))
+            delay = delay / 2 + self._rng() * delay / 2
+            self._retry_at = self._clock() + delay
+
+
+class ResilientCaller:
+    """Runs calls on their own thread with a deadline, behind a breaker.
+
+    ``is_failure`` decides which exceptions count against the breaker; errors
+    that prove the remote side is reachable (e.g. a 404) should not.
+    Each call gets a fresh daemon thread, so a call that outlives its deadline
+    (a stuck DNS lookup, a trickling read) is abandoned without delaying the
+    calls after it.
+    """
+
+    def __init__(
+        self,
+        timeout: float,
+        breaker: Optional[CircuitBreaker] = None,
+        is_failure: Callable[[BaseException], bool] = lambda exc: True,
+        name: str = "resilient",
+    ) -> None:
+        self._timeout = timeout
+        self._breaker = breaker or CircuitBreaker()
+        self._is_failure = is_failure
+        self._name = name
+
+    def call(self, fn: Callable[..., T], *args, **kwargs) -> T:
+        if not self._breaker.allow():
+            raise CircuitOpenError("Circuit open; skipping call.")
+        future: "Future[T]" = Future()
+
+        def _run() -> None:
+            if not future.set_running_or_notify_cancel():
+                return
+            try:
+                future.set_result(fn(*args, **kwargs))
+            except BaseException as exc:
+                future.set_exception(exc)
+
+        threading.Thread(target=_run, name=self._name, daemon=True).start()
+        try:
+            result = future.result(timeout=self._timeout)
+        except FutureTimeout:
+            self._breaker.record_failure()
+            raise DeadlineExceeded(
+                f"Call did not finish within {self._timeout:.1f}s."
+            ) from None
+        except Exception as exc:
+            if self._is_failure(exc):
+                self._breaker.record_failure()
+            else:
+                self._breaker.record_success()
+            raise
+        self._breaker.record_success()
+        return result
@@ -1,13 +1,24 @@
 from __future__ import annotations
 
-from dataclasses import dataclass
+from dataclasses import asdict, dataclass
+import json
 import os
-from typing import Optional
+from typing import Any, Callable, List, Optional, TypeVar
 from urllib import request
 
 import spotipy
 from spotipy.oauth2 import SpotifyOAuth
 
+from resilience import CircuitBreaker, CircuitOpenError, DeadlineExceeded, ResilientCaller
+from token_manager import AtomicCacheHandler, TokenManager
+from tracing import RecordingClient, TraceRecorder
+
+T = TypeVar("T")
+
+
+class SpotifyUnavailable(RuntimeError):
+    """Raised when the Spotify API cannot be reached or the breaker is open."""
+
 
 @dataclass(frozen=True)
 class TrackInfo:
@@ -18,8 +29,81 @@ class TrackInfo:
     is_playing: bool
 
 
+def _pick_image_url(images: List[dict], min_size: int) -> Optional[str]:
+    """Return the smallest image at least ``min_size`` wide, else the largest."""
+    if not images:
+        return None
+    if min_size <= 0:
+        return images[0]["url"]
+    by_size = sorted(images, key=lambda image: image.get("width") or 0)
+    for image in by_size:
+        if (image.get("width") or 0) >= min_size:
+            return image["url"]
+    return by_size[-1]["url"]
+
+
+def _is_outage(exc: BaseException) -> bool:
+    if isinstance(exc, spotipy.SpotifyException):
+        return exc.http_status == 429 or exc.http_status >= 500
+    # requests.RequestException and socket errors are both OSErrors.
+    return isinstance(exc, OSError)
+
+
 class SpotifyController:
-    def __init__(self) -> None:
+    def __init__(
+        self,
+        client: Optional[Any] = None,
+        recorder: Optional[TraceRecorder] = None,
+        download_art: bool = True,
+        timeout: Optional[float] = None,
+        backoff_base: Optional[float] = None,
+        backoff_max: Optional[float] = None,
+        art_cache_dir: Optional[str] = None,
+    ) -> None:
+        # Timing arguments default to the environment; replay passes scaled
+        # values so breaker behaviour tracks the recording.
+        if timeout is None:
+            timeout = float(os.environ.get("SPOTIFY_TIMEOUT_SEC", "3"))
+        if backoff_base is None:
+            # The first cooldown must outlast a poll interval, or the breaker
+            # reopens before it ever skips a poll.
+            backoff_base = float(
+                os.environ.get(
+                    "SPOTIFY_BACKOFF_BASE_SEC",
+                    2 * float(os.environ.get("SPOTIFY_POLL_SEC", "5")),
+                )
+            )
+        if backoff_max is None:
+            backoff_max = float(os.environ.get("SPOTIFY_BACKOFF_MAX_SEC", "60"))
+        self._timeout = timeout
+        self._token_manager: Optional[TokenManager] = None
+        if client is None:
+            client = self._create_client()
+        if recorder is not None:
+            client = RecordingClient(client, recorder)
+        self._sp = client
+        self._download_art = download_art
+        self._caller = ResilientCaller(
+            timeout=self._timeout,
+            breaker=CircuitBreaker(
+                failure_threshold=int(os.environ.get("SPOTIFY_BREAKER_THRESHOLD", "3")),
+                base_delay=backoff_base,
+                max_delay=backoff_max,
+            ),
+            is_failure=_is_outage,
+            name="spotify",
+        )
+        # Cover art comes from the image CDN, not the API, so its failures
+        # must not push the API breaker into offline mode.
+        self._art_caller = ResilientCaller(timeout=self._timeout, name="spotify-art")
+        self._art_cache_dir = art_cache_dir or os.environ.get(
+            "SPOTIFY_ART_CACHE", "/tmp/spotify-art"
+        )
+        os.makedirs(self._art_cache_dir, exist_ok=True)
+        self._last_track_path = os.path.join(self._art_cache_dir, "last_track.json")
+        self._last_track: Optional[TrackInfo] = self._load_last_track()
+
+    def _create_client(self) -> spotipy.Spotify:
         client_id = os.environ.get("SPOTIPY_CLIENT_ID")
         client_secret = os.environ.get("SPOTIPY_CLIENT_SECRET")
         redirect_uri = os.environ.get("SPOTIPY_REDIRECT_URI")
@@ -33,20 +117,70 @@ class SpotifyController:
             "user-read-playback-state user-read-currently-playing "
             "user-modify-playback-state user-library-modify"
         )
-        self._sp = spotipy.Spotify(
-            auth_manager=SpotifyOAuth(
+        cache_handler = AtomicCacheHandler(cache_path)
+        self._token_manager = TokenManager(
+            SpotifyOAuth(
                 client_id=client_id,
                 client_secret=client_secret,
                 redirect_uri=redirect_uri,
                 scope=scope,
-                cache_path=cache_path,
-            )
+                cache_handler=cache_handler,
+                requests_timeout=self._timeout,
+            ),
+            cache_handler,
+            margin_sec=float(os.environ.get("SPOTIFY_TOKEN_REFRESH_MARGIN_SEC", "300")),
+        )
+        # spotipy retries are disabled: backoff is handled by the breaker so a
+        # single call never exceeds the deadline.
+        return spotipy.Spotify(
+            auth_manager=self._token_manager,
+            requests_timeout=self._timeout,
+            retries=0,
         )
-        self._art_cache_dir = os.environ.get("SPOTIFY_ART_CACHE", "/tmp/spotify-art")
-        os.makedirs(self._art_cache_dir, exist_ok=True)
 
-    def current_track(self) -> Optional[TrackInfo]:
-        playback = self._sp.current_playback()
+    def _call(self, fn: Callable[..., T], *args, **kwargs) -> T:
+        try:
+            return self._caller.call(fn, *args, **kwargs)
+        except (CircuitOpenError, DeadlineExceeded) as exc:
+            raise SpotifyUnavailable(str(exc)) from exc
+        except Exception as exc:
+            if _is_outage(exc):
+                raise SpotifyUnavailable(str(exc)) from exc
+            raise
+
+    def close(self) -> None:
+        if self._token_manager is not None:
+            self._token_manager.close()
+
+    def last_known_track(self) -> Optional[TrackInfo]:
+        return self._last_track
+
+    def _load_last_track(self) -> Optional[TrackInfo]:
+        try:
+            with open(self._last_track_path, "r", encoding="utf-8") as handle:
+                return TrackInfo(**json.load(handle))
+        except (OSError, ValueError, TypeError):
+            return None
+
+    def _remember_track(self, track: Optional[TrackInfo]) -> None:
+        if track is None or track == self._last_track:
+            return
+        self._last_track = track
+        tmp_path = f"{self._last_track_path}.tmp"
+        try:
+            with open(tmp_path, "w", encoding="utf-8") as handle:
+                json.dump(asdict(track), handle)
+            os.replace(tmp_path, self._last_track_path)
+        except OSError:
+            pass
+
+    def current_track(self, art_size: int = 0) -> Optional[TrackInfo]:
+        track = self._fetch_current_track(art_size)
+        self._remember_track(track)
+        return track
+
+    def _fetch_current_track(self, art_size: int) -> Optional[TrackInfo]:
+        playback = self._call(self._sp.current_playback)
         if not playback or not playback.get("item"):
             return None
         item = playback["item"]
@@ -56,7 +190,7 @@ class SpotifyController:
         title = item.get("name", "")
         artist = ", ".join(artist["name"] for artist in item.get("artists", []))
         images = item.get("album", {}).get("images", [])
-        art_url = images[0]["url"] if images else None
+        art_url = _pick_image_url(images, art_size)
         return TrackInfo(
             track_id=track_id,
             title=title,
@@ -66,25 +200,25 @@ class SpotifyController:
         )
 
     def toggle_play_pause(self) -> None:
-        playback = self._sp.current_playback()
+        playback = self._call(self._sp.current_playback)
         if not playback:
             return
         if playback.get("is_playing"):
-            self._sp.pause_playback()
+            self._call(self._sp.pause_playback)
         else:
-            self._sp.start_playback()
+            self._call(self._sp.start_playback)
 
     def next_track(self) -> None:
-        self._sp.next_track()
+        self._call(self._sp.next_track)
 
     def like_current(self) -> None:
-        playback = self._sp.current_playback()
+        playback = self._call(self._sp.current_playback)
         if not playback or not playback.get("item"):
             return
         track_id = playback["item"].get("id")
         if not track_id:
             return
-        self._sp.current_user_saved_tracks_add([track_id])
+        self._call(self._sp.current_user_saved_tracks_add, [track_id])
 
     def get_album_art(self, track_id: str, art_url: Optional[str]) -> Optional[bytes]:
         if not track_id or not art_url:
@@ -93,9 +227,10 @@ class SpotifyController:
         if os.path.exists(cache_path):
             with open(cache_path, "rb") as handle:
                 return handle.read()
+        if not self._download_art:
+            return None
         try:
-            with request.urlopen(art_url, timeout=10) as response:
-                data = response.read()
+            data = self._art_caller.call(self._download, art_url)
         except Exception:
             return None
         try:
@@ -104,3 +239,7 @@ class SpotifyController:
         except OSError:
             pass
         return data
+
+    def _download(self, url: str) -> bytes:
+        with request.urlopen(url, timeout=self._timeout) as response:
+            return response.read()
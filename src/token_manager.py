@@ -0,0 +1,155 @@
+"""Background OAuth token refresh for the Spotify client.
+
+spotipy refreshes lazily: the first API call after expiry pays for a token
+request and a cache-file write. ``TokenManager`` refreshes on its own thread
+a margin before expiry, serves the token from memory, and hands cache writes
+to a writer thread so user-facing calls never wait on either.
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import threading
+import time
+from typing import Any, Dict, Optional
+
+from spotipy.cache_handler import CacheHandler
+from spotipy.oauth2 import SpotifyOAuth
+
+
+class AtomicCacheHandler(CacheHandler):
+    """In-memory token cache persisted atomically by a writer thread."""
+
+    def __init__(self, cache_path: str) -> None:
+        self._cache_path = cache_path
+        self._lock = threading.Lock()
+        self._write_lock = threading.Lock()
+        self._dirty = threading.Event()
+        self._token: Optional[Dict[str, Any]] = self._read()
+        self._writer = threading.Thread(
+            target=self._write_loop, name="token-cache", daemon=True
+        )
+        self._writer.start()
+
+    def _read(self) -> Optional[Dict[str, Any]]:
+        try:
+            with open(self._cache_path, "r", encoding="utf-8") as handle:
+                return json.load(handle)
+        except (OSError, ValueError):
+            return None
+
+    def get_cached_token(self) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            return dict(self._token) if self._token else None
+
+    def save_token_to_cache(self, token_info: Dict[str, Any]) -> None:
+        with self._lock:
+            self._token = dict(token_info)
+        self._dirty.set()
+
+    def flush(self) -> None:
+        """Write any pending token, waiting out a write already in progress."""
+        self._write_pending()
+
+    def _write_loop(self) -> None:
+        while True:
+            self._dirty.wait()
+            self._write_pending()
+
+    def _write_pending(self) -> None:
+        # Serialises the writer thread and flush(): both share the tmp path.
+        with self._write_lock:
+            if not self._dirty.is_set():
+                return
+            self._dirty.clear()
+            self._write()
+
+    def _write(self) -> None:
+        token = self.get_cached_token()
+        if token is None:
+            return
+        tmp_path = f"{self._cache_path}.tmp"
+        try:
+            fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+            with os.fdopen(fd, "w", encoding="utf-8") as handle:
+                json.dump(token, handle)
+                handle.flush()
+                os.fsync(handle.fileno())
+            os.replace(tmp_path, self._cache_path)
+        except OSError as exc:
+            print(f"Token cache write failed: {exc}")
+
+
+class TokenManager:
+    """spotipy auth manager that refreshes ahead of expiry in the background.
+
+    Pass it as ``auth_manager`` to ``spotipy.Spotify``. If the background
+    refresh has not kept up (e.g. the network was down), ``get_access_token``
+    falls back to spotipy's blocking refresh.
+    """
+
+    # Upper bound on a single sleep so wall-clock jumps (NTP sync after boot)
+    # are noticed promptly.
+    _MAX_WAIT_SEC = 60.0
+
+    def __init__(
+        self,
+        oauth: SpotifyOAuth,
+        cache_handler: AtomicCacheHandler,
+        margin_sec: float = 300.0,
+        retry_sec: float = 15.0,
+    ) -> None:
+        self._oauth = oauth
+        self._cache = cache_handler
+        self._margin_sec = margin_sec
+        self._retry_sec = retry_sec
+        self._refresh_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(
+            target=self._refresh_loop, name="token-refresh", daemon=True
+        )
+        self._thread.start()
+
+    def get_access_token(self, as_dict: bool = False) -> Any:
+        token = self._cache.get_cached_token()
+        if token is None or self._oauth.is_token_expired(token):
+            with self._refresh_lock:
+                token = self._oauth.validate_token(self._cache.get_cached_token())
+                if token is None:
+                    return self._oauth.get_access_token(as_dict=as_dict)
+        return token if as_dict else token["access_token"]
+
+    def _refresh_delay(self, token: Optional[Dict[str, Any]]) -> float:
+        if token is None or "refresh_token" not in token:
+            return self._retry_sec
+        # Never lead by more than half the token's lifetime, so a margin at or
+        # above the lifetime cannot cause back-to-back refreshes.
+        lead = min(self._margin_sec, token.get("expires_in", 3600) / 2)
+        return token.get("expires_at", 0) - lead - time.time()
+
+    def _refresh_loop(self) -> None:
+        failures = 0
+        while not self._stop.is_set():
+            delay = self._refresh_delay(self._cache.get_cached_token())
+            if delay > 0:
+                self._stop.wait(min(delay, self._MAX_WAIT_SEC))
+                continue
+            try:
+                with self._refresh_lock:
+                    # A blocking refresh in get_access_token may have won the
+                    # lock first; only refresh if the token is still due.
+                    token = self._cache.get_cached_token()
+                    if self._refresh_delay(token) <= 0:
+                        self._oauth.refresh_access_token(token["refresh_token"])
+                failures = 0
+            except Exception as exc:
+                failures += 1
+                print(f"Token refresh failed: {exc}")
+                self._stop.wait(
+                    min(self._retry_sec * 2 ** (failures - 1), self._MAX_WAIT_SEC)
+                )
+
+    def close(self) -> None:
+        self._stop.set()
+        self._cache.flush()
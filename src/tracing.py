@@ -0,0 +1,209 @@
+"""Record and replay raw touch events and Spotify API responses.
+
+A trace is a gzip-compressed JSON-lines file. Each line is one record with a
+timestamp ``t`` (seconds since recording started), a kind ``k`` and a few
+short payload fields:
+
+- ``evdev_info``: ``abs`` maps axis name to ``[min, max]`` (or null).
+- ``evdev``: ``e`` is a raw ``[type, code, value]`` input event.
+- ``gt1151``: ``p`` is a list of ``[x, y, size, track_id]`` touch points.
+- ``spotify``: ``m`` is the spotipy method, ``d`` the call duration, and
+  either ``r`` (the response) or ``e``/``s`` (error message/HTTP status).
+
+Set ``TRACE_RECORD=/path/trace.jsonl.gz`` to record from ``main.py`` and
+replay it with ``python3 src/replay.py``.
+"""
+
+from __future__ import annotations
+
+from collections import defaultdict, deque
+import gzip
+import json
+import threading
+import time
+from typing import Any, Deque, Dict, Iterable, Iterator, List, Optional
+import zlib
+
+
+def _open_trace(path: str, mode: str):
+    if path.endswith(".gz"):
+        return gzip.open(path, mode + "t", encoding="utf-8")
+    return open(path, mode, encoding="utf-8")
+
+
+class TraceRecorder:
+    """Appends records to a trace, sync-flushing at least once a second.
+
+    The periodic ``Z_SYNC_FLUSH`` keeps everything up to the last flush
+    readable if the process is killed or the Pi loses power before
+    ``close()``.
+    """
+
+    _FLUSH_INTERVAL_SEC = 1.0
+
+    def __init__(self, path: str) -> None:
+        self._compressed = path.endswith(".gz")
+        self._handle = gzip.open(path, "wb") if self._compressed else open(path, "wb")
+        self._start = time.monotonic()
+        self._last_flush = self._start
+        self._lock = threading.Lock()
+
+    def record(self, kind: str, **fields: Any) -> None:
+        now = time.monotonic()
+        entry = {"t": round(now - self._start, 4), "k": kind}
+        entry.update(fields)
+        line = json.dumps(entry, separators=(",", ":")) + "\n"
+        with self._lock:
+            if self._handle is None:
+                return
+            self._handle.write(line.encode("utf-8"))
+            if now - self._last_flush >= self._FLUSH_INTERVAL_SEC:
+                self._flush()
+                self._last_flush = now
+
+    def _flush(self) -> None:
+        if self._compressed:
+            self._handle.flush(zlib.Z_SYNC_FLUSH)
+        else:
+            self._handle.flush()
+
+    def close(self) -> None:
+        with self._lock:
+            if self._handle is not None:
+                self._handle.close()
+                self._handle = None
+
+
+def load_trace(path: str) -> List[Dict[str, Any]]:
+    """Load a trace, keeping every complete record before a truncated tail."""
+    records: List[Dict[str, Any]] = []
+    with _open_trace(path, "r") as handle:
+        try:
+            for line in handle:
+                if line.strip():
+                    records.append(json.loads(line))
+        except (EOFError, OSError, ValueError, zlib.error):
+            # Recording was cut off (kill, power loss) mid-stream or mid-line.
+            pass
+    return records
+
+
+class RecordingClient:
+    """Proxy for a spotipy client that records every call and its outcome."""
+
+    def __init__(self, client: Any, recorder: TraceRecorder) -> None:
+        self._client = client
+        self._recorder = recorder
+
+    def __getattr__(self, name: str) -> Any:
+        attr = getattr(self._client, name)
+        if not callable(attr):
+            return attr
+
+        def _recorded(*args: Any, **kwargs: Any) -> Any:
+            start = time.monotonic()
+            try:
+                result = attr(*args, **kwargs)
+            except Exception as exc:
+                self._recorder.record(
+                    "spotify",
+                    m=name,
+                    d=round(time.monotonic() - start, 4),
+                    e=str(exc),
+                    s=getattr(exc, "http_status", None),
+                )
+                raise
+            self._recorder.record(
+                "spotify", m=name, d=round(time.monotonic() - start, 4), r=result
+            )
+            return result
+
+        return _recorded
+
+
+def _replay_error(record: Dict[str, Any]) -> Exception:
+    status = record.get("s")
+    if status is not None:
+        import spotipy
+
+        return spotipy.SpotifyException(status, -1, record.get("e", ""))
+    return ConnectionError(record.get("e", ""))
+
+
+class ReplayClient:
+    """Stand-in for a spotipy client that serves recorded responses.
+
+    Responses are returned per method in recorded order, after sleeping for
+    the recorded call duration scaled by ``speed``. A method with no recorded
+    responses left returns ``None``, like an idle account.
+
+    Timestamps are not used to match calls to responses: if the replayed loop
+    makes calls in a different order or count than the recording (e.g. a tap's
+    ``current_playback`` lands before a poll), it consumes the next recorded
+    response for that method, and later behaviour can drift from the trace.
+    """
+
+    def __init__(self, records: Iterable[Dict[str, Any]], speed: float = 1.0) -> None:
+        self._speed = speed
+        self._responses: Dict[str, Deque[Dict[str, Any]]] = defaultdict(deque)
+        self._lock = threading.Lock()
+        for record in records:
+            if record.get("k") == "spotify":
+                self._responses[record["m"]].append(record)
+
+    @property
+    def pending(self) -> int:
+        with self._lock:
+            return sum(len(responses) for responses in self._responses.values())
+
+    def __getattr__(self, name: str) -> Any:
+        if name.startswith("_"):
+            raise AttributeError(name)
+
+        def _replayed(*args: Any, **kwargs: Any) -> Any:
+            with self._lock:
+                responses = self._responses.get(name)
+                record = responses.popleft() if responses else None
+            if record is None:
+                return None
+            time.sleep(record.get("d", 0.0) / self._speed)
+            if "e" in record:
+                raise _replay_error(record)
+            return record.get("r")
+
+        return _replayed
+
+
+class TraceReplayer:
+    def __init__(self, records: List[Dict[str, Any]], speed: float = 1.0) -> None:
+        if speed <= 0:
+            raise ValueError("Replay speed must be positive.")
+        self._records = records
+        self._speed = speed
+
+    @property
+    def duration(self) -> float:
+        """Wall-clock length of the replay at the configured speed."""
+        if not self._records:
+            return 0.0
+        return self._records[-1]["t"] / self._speed
+
+    def evdev_absinfo(self) -> Dict[str, Optional[List[int]]]:
+        for record in self._records:
+            if record["k"] == "evdev_info":
+                return record["abs"]
+        return {}
+
+    def spotify_client(self) -> ReplayClient:
+        return ReplayClient(self._records, self._speed)
+
+    def touch_records(self) -> Iterator[Dict[str, Any]]:
+        """Yield touch records, paced to their scaled timestamps."""
+        start = time.monotonic()
+        for record in self._records:
+            if record["k"] not in ("evdev", "gt1151"):
+                continue
+            delay = start + record["t"] / self._speed - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+            yield record
@@ -0,0 +1,5 @@
+import os
+import sys
+
+# The app runs as plain scripts from src/, so tests import modules the same way.
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), os.pardir, "src"))
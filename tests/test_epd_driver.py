@@ -0,0 +1,229 @@
+"""FastEPD against a fake epdconfig module and spidev object."""
+
+from __future__ import annotations
+
+import random
+import sys
+import types
+
+import pytest
+from PIL import Image
+
+from epd_driver import FastEPD, wrap_fast_transfer
+
+FAKE_MODULE = "waveshare_epd.fake_epd2in13_V4"
+DC_PIN = 25
+CS_PIN = 8
+
+
+class FakeSpi:
+    def __init__(self, log, fail_after=None):
+        self._log = log
+        self._fail_after = fail_after
+
+    def writebytes2(self, data):
+        if self._fail_after is not None:
+            if self._fail_after == 0:
+                raise OSError("spi write failed")
+            self._fail_after -= 1
+        self._log.append(("spi", bytes(data)))
+
+
+class FakeSpiWritebytesOnly:
+    def __init__(self, log):
+        self._log = log
+
+    def writebytes(self, data):
+        assert isinstance(data, list)
+        self._log.append(("spi", bytes(data)))
+
+
+class FakeEPD:
+    width = 122
+    height = 250
+    dc_pin = DC_PIN
+    cs_pin = CS_PIN
+
+    def __init__(self, log):
+        self._log = log
+
+    def send_command(self, command):
+        self._log.append(("cmd", command))
+
+    def TurnOnDisplay(self):
+        self._log.append(("on",))
+
+    def SetWindow(self, x_start, y_start, x_end, y_end):
+        self._log.append(("window", x_start, y_start, x_end, y_end))
+
+    def SetCursor(self, x, y):
+        self._log.append(("cursor", x, y))
+
+
+FakeEPD.__module__ = FAKE_MODULE
+
+
+@pytest.fixture
+def log():
+    return []
+
+
+@pytest.fixture
+def epdconfig(monkeypatch, log):
+    config = types.ModuleType("waveshare_epd.epdconfig")
+    config.SPI = FakeSpi(log)
+    config.digital_write = lambda pin, value: log.append(("pin", pin, value))
+    module = types.ModuleType(FAKE_MODULE)
+    module.epdconfig = config
+    monkeypatch.setitem(sys.modules, FAKE_MODULE, module)
+    return config
+
+
+@pytest.fixture
+def epd(epdconfig, log):
+    wrapped = wrap_fast_transfer(FakeEPD(log))
+    assert isinstance(wrapped, FastEPD)
+    return wrapped
+
+
+def _noise_image(size):
+    rng = random.Random(1234)
+    width, height = size
+    data = bytes(rng.getrandbits(8) for _ in range(width * height))
+    return Image.frombytes("L", size, data)
+
+
+def _stock_getbuffer(image, width, height):
+    """The packing done by the Waveshare V3/V4 drivers."""
+    if image.size == (width, height):
+        image = image.convert("1")
+    else:
+        image = image.rotate(90, expand=True).convert("1")
+    return bytearray(image.tobytes("raw"))
+
+
+def _spi_payload(log):
+    return [entry[1] for entry in log if entry[0] == "spi"]
+
+
+@pytest.mark.parametrize("size", [(122, 250), (250, 122)])
+def test_getbuffer_matches_stock_packing(epd, size):
+    image = _noise_image(size)
+    assert epd.getbuffer(image) == _stock_getbuffer(image, 122, 250)
+
+
+def test_getbuffer_rejects_wrong_size(epd):
+    with pytest.raises(ValueError):
+        epd.getbuffer(Image.new("1", (100, 100), 255))
+
+
+def test_display_streams_frame_in_chunks(epd, log, monkeypatch):
+    monkeypatch.setattr(FastEPD, "_CHUNK_SIZE", 1024)
+    buffer = bytes(range(256)) * 15 + bytes(160)
+
+    epd.display(buffer)
+
+    assert log[:2] == [("window", 0, 0, 121, 249), ("cursor", 0, 0)]
+    assert log[2:5] == [("cmd", 0x24), ("pin", DC_PIN, 1), ("pin", CS_PIN, 0)]
+    payload = _spi_payload(log)
+    assert [len(chunk) for chunk in payload] == [1024, 1024, 1024, 928]
+    assert b"".join(payload) == buffer
+    assert log[-2:] == [("pin", CS_PIN, 1), ("on",)]
+    assert epd.last_transfer.num_bytes == 4000
+
+
+def test_clear_sends_full_frame_of_color(epd, log):
+    epd.Clear(0xFF)
+
+    assert ("cmd", 0x24) in log
+    assert b"".join(_spi_payload(log)) == b"\xff" * 4000
+    assert epd.last_transfer.num_bytes == 4000
+
+
+def test_cs_released_when_write_fails(epdconfig, log, monkeypatch):
+    monkeypatch.setattr(FastEPD, "_CHUNK_SIZE", 1024)
+    epdconfig.SPI = FakeSpi(log, fail_after=1)
+    epd = wrap_fast_transfer(FakeEPD(log))
+
+    with pytest.raises(OSError):
+        epd.display(bytes(4000))
+
+    assert log[-1] == ("pin", CS_PIN, 1)
+    assert ("on",) not in log
+
+
+def test_writebytes_fallback(epdconfig, log, monkeypatch):
+    monkeypatch.setattr(FastEPD, "_CHUNK_SIZE", 1024)
+    epd = FastEPD(FakeEPD(log), spi=FakeSpiWritebytesOnly(log))
+    buffer = bytes(range(250)) * 16
+
+    epd.display(buffer)
+
+    payload = _spi_payload(log)
+    assert [len(chunk) for chunk in payload] == [1024, 1024, 1024, 928]
+    assert b"".join(payload) == buffer
+
+
+def test_write_window_slices_rows_and_columns(epd, log):
+    line_bytes = 16
+    buffer = bytes(
+        (row * 7 + col) & 0xFF for row in range(250) for col in range(line_bytes)
+    )
+
+    stats = epd.write_window(buffer, 16, 10, 47, 13)
+
+    expected = b"".join(
+        buffer[row * line_bytes + 2 : row * line_bytes + 6] for row in range(10, 14)
+    )
+    assert ("window", 16, 10, 47, 13) in log
+    assert ("cursor", 2, 10) in log
+    assert b"".join(_spi_payload(log)) == expected
+    assert stats.num_bytes == len(expected) == 16
+    assert epd.last_transfer.num_bytes == 16
+
+
+def test_display_after_window_resets_full_window(epd, log):
+    buffer = bytes(4000)
+    epd.write_window(buffer, 0, 0, 31, 3)
+    log.clear()
+
+    epd.display(buffer)
+
+    assert log[:2] == [("window", 0, 0, 121, 249), ("cursor", 0, 0)]
+
+
+def test_write_window_requires_byte_aligned_x(epd):
+    with pytest.raises(ValueError):
+        epd.write_window(bytes(4000), 3, 0, 31, 3)
+
+
+@pytest.mark.parametrize(
+    "window",
+    [
+        (0, 0, 122, 3),  # x1 past the panel width
+        (120, 0, 127, 3),  # x1 in the row padding bits
+        (0, 0, 31, 250),  # y1 past the panel height
+        (0, 5, 31, 4),  # y0 > y1
+        (16, 0, 8, 3),  # x0 > x1
+        (-8, 0, 31, 3),
+    ],
+)
+def test_write_window_rejects_out_of_bounds(epd, log, window):
+    with pytest.raises(ValueError):
+        epd.write_window(bytes(4000), *window)
+    assert log == []
+
+
+def test_write_window_accepts_last_pixel(epd, log):
+    stats = epd.write_window(bytes(4000), 120, 249, 121, 249)
+
+    assert stats.num_bytes == 1
+
+
+def test_wrap_returns_plain_driver_without_epdconfig(log):
+    class PlainEPD:
+        width = 122
+        height = 250
+
+    plain = PlainEPD()
+    assert wrap_fast_transfer(plain) is plain
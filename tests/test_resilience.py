@@ -0,0 +1,143 @@
+"""CircuitBreaker and ResilientCaller with a fake clock."""
+
+from __future__ import annotations
+
+import threading
+
+import pytest
+
+from resilience import CircuitBreaker, CircuitOpenError, DeadlineExceeded, ResilientCaller
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class NotFound(Exception):
+    pass
+
+
+@pytest.fixture
+def clock():
+    return FakeClock()
+
+
+def _breaker(clock, rng=lambda: 1.0):
+    return CircuitBreaker(
+        failure_threshold=3, base_delay=10.0, max_delay=60.0, clock=clock, rng=rng
+    )
+
+
+def _trip(breaker):
+    for _ in range(3):
+        assert breaker.allow()
+        breaker.record_failure()
+
+
+def test_opens_after_threshold(clock):
+    breaker = _breaker(clock)
+    for _ in range(2):
+        assert breaker.allow()
+        breaker.record_failure()
+    assert breaker.allow()
+    breaker.record_failure()
+
+    assert not breaker.allow()
+    clock.now = 9.9
+    assert not breaker.allow()
+
+
+def test_jitter_keeps_cooldown_between_half_and_full_delay(clock):
+    breaker = _breaker(clock, rng=lambda: 0.0)
+    _trip(breaker)
+
+    clock.now = 4.9
+    assert not breaker.allow()
+    clock.now = 5.0
+    assert breaker.allow()
+
+
+def test_half_open_allows_single_trial(clock):
+    breaker = _breaker(clock)
+    _trip(breaker)
+    clock.now = 10.0
+
+    assert breaker.allow()
+    assert not breaker.allow()
+
+    breaker.record_success()
+    assert breaker.allow()
+    assert breaker.allow()
+
+
+def test_failed_trial_reopens_with_doubled_delay(clock):
+    breaker = _breaker(clock)
+    _trip(breaker)
+    clock.now = 10.0
+    assert breaker.allow()
+    breaker.record_failure()
+
+    clock.now = 29.9
+    assert not breaker.allow()
+    clock.now = 30.0
+    assert breaker.allow()
+    breaker.record_failure()
+
+    # 40 s next, then capped at max_delay.
+    clock.now = 70.0
+    assert breaker.allow()
+    breaker.record_failure()
+    clock.now = 129.9
+    assert not breaker.allow()
+    clock.now = 130.0
+    assert breaker.allow()
+
+
+def test_caller_raises_circuit_open_without_calling(clock):
+    caller = ResilientCaller(timeout=1.0, breaker=_breaker(clock))
+    calls = []
+
+    def fail():
+        calls.append(1)
+        raise ConnectionError("down")
+
+    for _ in range(3):
+        with pytest.raises(ConnectionError):
+            caller.call(fail)
+    with pytest.raises(CircuitOpenError):
+        caller.call(fail)
+    assert len(calls) == 3
+
+
+def test_non_outage_error_closes_half_open_breaker(clock):
+    breaker = _breaker(clock)
+    caller = ResilientCaller(
+        timeout=1.0,
+        breaker=breaker,
+        is_failure=lambda exc: not isinstance(exc, NotFound),
+    )
+    _trip(breaker)
+    clock.now = 10.0
+
+    def not_found():
+        raise NotFound("404")
+
+    with pytest.raises(NotFound):
+        caller.call(not_found)
+    assert caller.call(lambda: 1) == 1
+    assert breaker.allow()
+
+
+def test_hung_call_does_not_block_the_next_one(clock):
+    release = threading.Event()
+    caller = ResilientCaller(timeout=0.05, breaker=_breaker(clock))
+    try:
+        with pytest.raises(DeadlineExceeded):
+            caller.call(release.wait)
+        assert caller.call(lambda: 1) == 1
+    finally:
+        release.set()
@@ -0,0 +1,165 @@
+"""TokenManager and AtomicCacheHandler with a fake SpotifyOAuth."""
+
+from __future__ import annotations
+
+import json
+import os
+import stat
+import threading
+import time
+
+import pytest
+from spotipy.oauth2 import SpotifyOAuth
+
+from token_manager import AtomicCacheHandler, TokenManager
+
+SCOPE = "user-read-playback-state"
+
+
+class FakeOAuth(SpotifyOAuth):
+    """SpotifyOAuth whose token endpoint is local and counts refreshes."""
+
+    def __init__(self, cache_handler, refresh_sec=0.0):
+        super().__init__(
+            client_id="id",
+            client_secret="secret",
+            redirect_uri="http://127.0.0.1/callback",
+            scope=SCOPE,
+            cache_handler=cache_handler,
+        )
+        self.refreshes = 0
+        self._refresh_sec = refresh_sec
+        self._count_lock = threading.Lock()
+
+    def refresh_access_token(self, refresh_token):
+        time.sleep(self._refresh_sec)
+        with self._count_lock:
+            self.refreshes += 1
+            count = self.refreshes
+        token = _token(f"access-{count}", expires_in=3600)
+        token["refresh_token"] = refresh_token
+        self.cache_handler.save_token_to_cache(token)
+        return token
+
+
+def _token(access_token, expires_in, expires_at=None):
+    if expires_at is None:
+        expires_at = int(time.time()) + expires_in
+    return {
+        "access_token": access_token,
+        "refresh_token": "refresh",
+        "expires_in": expires_in,
+        "expires_at": expires_at,
+        "scope": SCOPE,
+    }
+
+
+def _wait_for(predicate, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if predicate():
+            return True
+        time.sleep(0.01)
+    return predicate()
+
+
+@pytest.fixture
+def cache_path(tmp_path):
+    return str(tmp_path / ".cache-spotipy")
+
+
+def _seed(cache_path, token):
+    with open(cache_path, "w", encoding="utf-8") as handle:
+        json.dump(token, handle)
+
+
+def test_refreshes_ahead_of_expiry_and_writes_atomically(cache_path):
+    _seed(cache_path, _token("old", 3600, expires_at=int(time.time()) + 100))
+    handler = AtomicCacheHandler(cache_path)
+    oauth = FakeOAuth(handler)
+    manager = TokenManager(oauth, handler, margin_sec=300)
+
+    assert _wait_for(lambda: oauth.refreshes == 1)
+    assert manager.get_access_token() == "access-1"
+    manager.close()
+
+    with open(cache_path, encoding="utf-8") as handle:
+        assert json.load(handle)["access_token"] == "access-1"
+    assert stat.S_IMODE(os.stat(cache_path).st_mode) == 0o600
+    assert not os.path.exists(f"{cache_path}.tmp")
+
+
+def test_margin_above_lifetime_does_not_refresh_back_to_back(cache_path):
+    _seed(cache_path, _token("old", 3600, expires_at=int(time.time()) + 100))
+    handler = AtomicCacheHandler(cache_path)
+    oauth = FakeOAuth(handler)
+    manager = TokenManager(oauth, handler, margin_sec=7200)
+
+    assert _wait_for(lambda: oauth.refreshes >= 1)
+    time.sleep(0.2)
+    manager.close()
+
+    assert oauth.refreshes == 1
+
+
+def test_fresh_token_is_served_without_refresh(cache_path):
+    _seed(cache_path, _token("fresh", expires_in=3600))
+    handler = AtomicCacheHandler(cache_path)
+    oauth = FakeOAuth(handler)
+    manager = TokenManager(oauth, handler, margin_sec=300)
+
+    assert manager.get_access_token() == "fresh"
+    time.sleep(0.1)
+    manager.close()
+
+    assert oauth.refreshes == 0
+
+
+class GatedCacheHandler(AtomicCacheHandler):
+    """Holds the refresh thread's first read until the test releases it."""
+
+    def __init__(self, cache_path):
+        super().__init__(cache_path)
+        self.background_read = threading.Event()
+        self.release = threading.Event()
+
+    def get_cached_token(self):
+        token = super().get_cached_token()
+        if (
+            threading.current_thread().name == "token-refresh"
+            and not self.background_read.is_set()
+        ):
+            self.background_read.set()
+            self.release.wait(2.0)
+        return token
+
+
+def test_expired_token_at_boot_is_refreshed_once(cache_path):
+    _seed(cache_path, _token("stale", 3600, expires_at=int(time.time()) - 10))
+    handler = GatedCacheHandler(cache_path)
+    oauth = FakeOAuth(handler)
+    manager = TokenManager(oauth, handler, margin_sec=300)
+
+    # The refresh thread has seen the stale token; the first API call now wins
+    # the refresh lock and refreshes in the foreground.
+    assert handler.background_read.wait(2.0)
+    assert manager.get_access_token() == "access-1"
+    handler.release.set()
+    time.sleep(0.2)
+    manager.close()
+
+    assert oauth.refreshes == 1
+
+
+def test_concurrent_flushes_leave_a_valid_cache_file(cache_path):
+    handler = AtomicCacheHandler(cache_path)
+    for index in range(100):
+        handler.save_token_to_cache(_token(str(index) * 40, expires_in=3600))
+        flusher = threading.Thread(target=handler.flush)
+        flusher.start()
+        handler.flush()
+        flusher.join()
+    handler.flush()
+
+    with open(cache_path, encoding="utf-8") as handle:
+        assert json.load(handle)["access_token"] == "99" * 40
@@ -0,0 +1,149 @@
+"""Trace recording, loading and replay, plus the evdev touch decoder."""
+
+from __future__ import annotations
+
+import gzip
+import shutil
+
+import pytest
+import spotipy
+
+from main import _EvdevTouchDecoder
+from tracing import ReplayClient, TraceRecorder, load_trace
+
+EV_SYN, EV_KEY, EV_ABS = 0x00, 0x01, 0x03
+SYN_REPORT = 0x00
+BTN_TOUCH = 0x14A
+ABS_X, ABS_Y = 0x00, 0x01
+ABS_MT_POSITION_X, ABS_MT_POSITION_Y, ABS_MT_TRACKING_ID = 0x35, 0x36, 0x39
+
+
+@pytest.mark.parametrize("name", ["trace.jsonl.gz", "trace.jsonl"])
+def test_recorder_round_trip(tmp_path, name):
+    path = str(tmp_path / name)
+    recorder = TraceRecorder(path)
+    recorder.record("evdev_info", abs={"x": [0, 121], "y": None})
+    recorder.record("evdev", e=[EV_ABS, ABS_X, 42])
+    recorder.record("spotify", m="next_track", d=0.1, e="boom", s=503)
+    recorder.close()
+    recorder.record("evdev", e=[EV_SYN, SYN_REPORT, 0])
+
+    records = load_trace(path)
+
+    assert [record["k"] for record in records] == ["evdev_info", "evdev", "spotify"]
+    assert records[0]["abs"] == {"x": [0, 121], "y": None}
+    assert records[1]["e"] == [EV_ABS, ABS_X, 42]
+    assert records[2]["s"] == 503
+    assert all(isinstance(record["t"], float) for record in records)
+
+
+def test_load_trace_keeps_records_before_truncated_tail(tmp_path, monkeypatch):
+    monkeypatch.setattr(TraceRecorder, "_FLUSH_INTERVAL_SEC", 0.0)
+    path = str(tmp_path / "trace.jsonl.gz")
+    recorder = TraceRecorder(path)
+    for value in range(20):
+        recorder.record("evdev", e=[EV_ABS, ABS_X, value])
+    # Simulate the process dying before close(): copy what reached the disk.
+    killed = str(tmp_path / "killed.jsonl.gz")
+    shutil.copy(path, killed)
+    recorder.close()
+
+    records = load_trace(killed)
+
+    assert [record["e"][2] for record in records] == list(range(20))
+
+
+def test_load_trace_drops_partial_last_line(tmp_path):
+    path = str(tmp_path / "trace.jsonl.gz")
+    with gzip.open(path, "wt", encoding="utf-8") as handle:
+        handle.write('{"t":0.0,"k":"evdev","e":[3,0,1]}\n{"t":0.1,"k":"ev')
+
+    assert load_trace(path) == [{"t": 0.0, "k": "evdev", "e": [3, 0, 1]}]
+
+
+def _spotify(method, **fields):
+    return {"t": 0.0, "k": "spotify", "m": method, "d": 0.0, **fields}
+
+
+def test_replay_client_serves_responses_fifo_per_method():
+    client = ReplayClient(
+        [
+            _spotify("current_playback", r={"n": 1}),
+            _spotify("next_track", r=None),
+            _spotify("current_playback", r={"n": 2}),
+            {"t": 0.0, "k": "evdev", "e": [0, 0, 0]},
+        ]
+    )
+
+    assert client.pending == 3
+    assert client.current_playback() == {"n": 1}
+    assert client.current_playback() == {"n": 2}
+    assert client.current_playback() is None
+    assert client.next_track() is None
+    assert client.pending == 0
+
+
+def test_replay_client_replays_errors():
+    client = ReplayClient(
+        [
+            _spotify("current_playback", e="server error", s=503),
+            _spotify("current_playback", e="connection reset", s=None),
+        ]
+    )
+
+    with pytest.raises(spotipy.SpotifyException) as excinfo:
+        client.current_playback()
+    assert excinfo.value.http_status == 503
+    with pytest.raises(ConnectionError):
+        client.current_playback()
+
+
+def test_replay_client_rejects_private_attributes():
+    with pytest.raises(AttributeError):
+        ReplayClient([])._missing
+
+
+ABSINFO = {"x": [0, 121], "y": [0, 249], "mx": None, "my": None}
+
+
+def _feed(decoder, events):
+    touches = [decoder.feed(*event) for event in events]
+    return [touch for touch in touches if touch is not None]
+
+
+def _tap(x, y):
+    return [
+        (EV_ABS, ABS_X, x),
+        (EV_ABS, ABS_Y, y),
+        (EV_KEY, BTN_TOUCH, 1),
+        (EV_SYN, SYN_REPORT, 0),
+        (EV_KEY, BTN_TOUCH, 0),
+        (EV_SYN, SYN_REPORT, 0),
+    ]
+
+
+def test_decoder_without_rotation():
+    decoder = _EvdevTouchDecoder(ABSINFO, 122, 250, needs_rotate=False)
+
+    assert _feed(decoder, _tap(10, 200)) == [(10, 200)]
+
+
+def test_decoder_rotates_portrait_into_landscape():
+    decoder = _EvdevTouchDecoder(ABSINFO, 122, 250, needs_rotate=True)
+
+    assert _feed(decoder, _tap(10, 200)) == [(200, 111)]
+
+
+def test_decoder_maps_multitouch_axes_and_tracking_id():
+    absinfo = {"x": None, "y": None, "mx": [0, 1219], "my": [0, 2499]}
+    decoder = _EvdevTouchDecoder(absinfo, 122, 250, needs_rotate=True)
+    events = [
+        (EV_ABS, ABS_MT_TRACKING_ID, 5),
+        (EV_ABS, ABS_MT_POSITION_X, 1219),
+        (EV_ABS, ABS_MT_POSITION_Y, 0),
+        (EV_SYN, SYN_REPORT, 0),
+        (EV_ABS, ABS_MT_TRACKING_ID, -1),
+        (EV_SYN, SYN_REPORT, 0),
+    ]
+
+    assert _feed(decoder, events) == [(0, 0)]